@@ -2,7 +2,8 @@ import cv2
 import logging
 import os
 from dotenv import load_dotenv
-from ultralytics import YOLO
+from model_loader import load_yolo, warm_up
+from crossing_zones import ZoneEngine, get_zone_config, load_zones
 
 # Load environment variables
 load_dotenv()
@@ -34,11 +35,12 @@ class CarDetector:
     def __init__(self):
         self.model = None
         self.crossed_cars = {}
-        self.processed_cars = set()  # Track cars that already had images taken
+        self.processed_cars = set()  # (car_id, zone) pairs that already had images taken
         self.last_detections = []
         self.car_counter = 0
         self.tracked_cars = {}
         self.id_mapping = {}  # Map unstable IDs to stable sequential IDs
+        self.zone_engine = None
         
         # Load settings from centralized config
         config = get_env_config()
@@ -52,14 +54,14 @@ class CarDetector:
         self.crop_padding = config['crop_padding']
         self.min_car_height = config['min_car_height']
         self.verbose = config['verbose']
+        self.zones_file = get_zone_config()['zones_file']
         
     def load_model(self):
         """Load and optimize YOLO model"""
         try:
             if self.verbose:
                 print("Loading YOLO11n model...")
-            self.model = YOLO(self.model_path)
-            self.model.fuse()
+            self.model = load_yolo(self.model_path, self.yolo_image_size)
             if self.verbose:
                 print("YOLO11n model loaded successfully.")
             logging.info("YOLO11n model loaded successfully.")
@@ -69,6 +71,12 @@ class CarDetector:
             logging.error(f"Error loading model: {e}")
             return False
     
+    def warm_up(self):
+        """Run warm-up inferences, returns seconds spent"""
+        if self.model is None:
+            return 0.0
+        return warm_up(self.model, self.yolo_image_size)
+    
     def detect_cars(self, frame):
         """Detect cars in frame and return detections"""
         if self.model is None:
@@ -99,26 +107,42 @@ class CarDetector:
         
         return detections
     
+    def setup_zones(self, frame_width, frame_height, line_y):
+        """Build crossing zones from ZONES_FILE, or a single line at line_y"""
+        if self.zones_file:
+            zones = load_zones(self.zones_file, frame_width, frame_height)
+            self.zone_engine = ZoneEngine(zones)
+        else:
+            self.zone_engine = ZoneEngine.from_horizontal_line(line_y, frame_width)
+        logging.info(f"Crossing zones: {', '.join(z['name'] for z in self.zone_engine.zones)}")
+    
     def check_line_crossing(self, detections, line_y, timestamp):
-        """Check if any car's centroid crossed the detection line"""
+        """Check which cars crossed a zone since their previous position"""
         crossings = []
-        current_time = timestamp
         
-        # No need to clean entries - each car ID processed only once
+        if self.zone_engine is None:
+            # Frame width unknown here, so span any realistic frame
+            self.zone_engine = ZoneEngine.from_horizontal_line(line_y, 1e6)
         
         # Get cars with IDs
         cars_with_ids = self.assign_car_ids(detections)
+        cars_by_id = {car[5]: car for car in cars_with_ids}
         
-        for x1, y1, x2, y2, conf, car_id, centroid_x, centroid_y in cars_with_ids:
-            # Check if car's centroid crossed the line
-            if centroid_y >= line_y:
-                # Check if this car hasn't been processed before
-                if car_id not in self.processed_cars:
-                    self.processed_cars.add(car_id)
-                    crossings.append((x1, y1, x2, y2, conf, timestamp, car_id))
-                    
-                    if self.verbose:
-                        print(f"Car {car_id} crossed line at centroid ({centroid_x}, {centroid_y})")
+        events = self.zone_engine.update(
+            list(cars_by_id), [(car[6], car[7]) for car in cars_by_id.values()]
+        )
+        
+        for car_id, zone_name, direction in events:
+            # One image per car and zone
+            if (car_id, zone_name) in self.processed_cars:
+                continue
+            self.processed_cars.add((car_id, zone_name))
+            
+            x1, y1, x2, y2, conf, _, centroid_x, centroid_y = cars_by_id[car_id]
+            crossings.append((x1, y1, x2, y2, conf, timestamp, car_id, zone_name, direction))
+            
+            if self.verbose:
+                print(f"Car {car_id} crossed {zone_name} ({direction}) at centroid ({centroid_x}, {centroid_y})")
         
         return crossings
     
@@ -162,9 +186,12 @@ class CarDetector:
         return current_cars
     
     def draw_detections(self, frame, detections, line_y):
-        """Draw bounding boxes with car IDs and detection line on frame"""
-        # Draw detection line
-        cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (0, 0, 255), 3)
+        """Draw bounding boxes with car IDs and crossing zones on frame"""
+        # Draw crossing zones, or the plain detection line before they exist
+        if self.zone_engine is not None:
+            self.zone_engine.draw(frame)
+        else:
+            cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (0, 0, 255), 3)
         
         # Assign car IDs
         cars_with_ids = self.assign_car_ids(detections)
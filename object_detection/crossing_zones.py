@@ -0,0 +1,191 @@
+import cv2
+import json
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Line "in" means moving from the left of A->B to its right in image
+# coordinates, e.g. top to bottom for a line drawn left to right.
+# Polygon "in" means entering the polygon, "out" means leaving it.
+DIRECTIONS = ('in', 'out', 'both')
+
+def get_zone_config():
+    """Get crossing zone configuration"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    config = {
+        'zones_file': os.getenv('ZONES_FILE', ''),
+        # Processed frames a missing track keeps its last centroid, like ByteTrack's buffer
+        'max_track_age': int(os.getenv('TRACK_BUFFER', 30))
+    }
+
+    # Make zones path absolute if relative
+    if config['zones_file'] and not os.path.isabs(config['zones_file']):
+        config['zones_file'] = os.path.join(project_root, config['zones_file'])
+
+    return config
+
+def load_zones(zones_file, frame_width, frame_height):
+    """Load zones from JSON, scaling fractional points to frame pixels.
+
+    Format: [{"name": "gate", "type": "line" | "polygon",
+              "points": [[x, y], ...], "direction": "in" | "out" | "both"}]
+    """
+    with open(zones_file, 'r') as f:
+        raw_zones = json.load(f)
+
+    scale = np.array([frame_width, frame_height], dtype=np.float64)
+    zones = []
+    for i, zone in enumerate(raw_zones):
+        zone_type = zone.get('type', 'line')
+        points = np.asarray(zone['points'], dtype=np.float64) * scale
+        direction = zone.get('direction', 'both')
+        if zone_type not in ('line', 'polygon'):
+            raise ValueError(f"Zone {i}: unknown type {zone_type!r}")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Zone {i}: unknown direction {direction!r}")
+        if zone_type == 'line' and len(points) != 2:
+            raise ValueError(f"Zone {i}: a line needs exactly 2 points")
+        if zone_type == 'polygon' and len(points) < 3:
+            raise ValueError(f"Zone {i}: a polygon needs at least 3 points")
+        zones.append({
+            'name': zone.get('name', f"zone{i + 1}"),
+            'type': zone_type,
+            'points': points,
+            'direction': direction
+        })
+    return zones
+
+class ZoneEngine:
+    """Direction-aware crossing tests for many tracks against many zones.
+
+    Stores each track's last known centroid; every frame the movement
+    segments of all tracks are tested against all lines (segment
+    intersection) and all polygons (point-in-polygon) at once with NumPy.
+    Tracks missing from a few frames keep their last centroid for up to
+    max_age updates, so detection flicker near a line does not lose them.
+    """
+
+    def __init__(self, zones, max_age=None):
+        self.zones = zones
+        self.max_age = get_zone_config()['max_track_age'] if max_age is None else max_age
+        self.prev_centroids = {}
+        self.last_seen = {}
+        self.frame_number = 0
+
+        lines = [z for z in zones if z['type'] == 'line']
+        polygons = [z for z in zones if z['type'] == 'polygon']
+
+        self.line_names = [z['name'] for z in lines]
+        self.line_directions = [z['direction'] for z in lines]
+        self.line_a = np.array([z['points'][0] for z in lines], dtype=np.float64).reshape(-1, 2)
+        self.line_b = np.array([z['points'][1] for z in lines], dtype=np.float64).reshape(-1, 2)
+
+        # All polygon edges concatenated; reduceat offsets mark where each polygon starts
+        self.polygon_names = [z['name'] for z in polygons]
+        self.polygon_directions = [z['direction'] for z in polygons]
+        edge_starts, edge_ends, offsets = [], [], []
+        for z in polygons:
+            offsets.append(len(edge_starts))
+            edge_starts.extend(z['points'])
+            edge_ends.extend(np.roll(z['points'], -1, axis=0))
+        self.edge_start = np.array(edge_starts, dtype=np.float64).reshape(-1, 2)
+        self.edge_end = np.array(edge_ends, dtype=np.float64).reshape(-1, 2)
+        self.polygon_offsets = np.array(offsets, dtype=np.intp)
+
+    @classmethod
+    def from_horizontal_line(cls, line_y, frame_width, name='line', max_age=None):
+        """Single full-width counting line, the classic detection line"""
+        points = np.array([[0, line_y], [frame_width, line_y]], dtype=np.float64)
+        return cls([{'name': name, 'type': 'line', 'points': points, 'direction': 'both'}], max_age)
+
+    @staticmethod
+    def _cross(o, a, b):
+        """z of (a - o) x (b - o), broadcasting over leading axes"""
+        return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+    def _line_crossings(self, prev, curr):
+        """Return (T, L) sign of crossing: +1 left-to-right, -1 right-to-left, 0 none"""
+        p = prev[:, None, :]
+        q = curr[:, None, :]
+        a = self.line_a[None, :, :]
+        b = self.line_b[None, :, :]
+
+        side_prev = self._cross(a, b, p)
+        side_curr = self._cross(a, b, q)
+        side_a = self._cross(p, q, a)
+        side_b = self._cross(p, q, b)
+
+        # Ending exactly on the line counts; starting on it does not, so a
+        # track resting on the line is not counted twice
+        crosses = (side_prev * side_curr <= 0) & (side_prev != 0) & (side_a * side_b <= 0)
+        return np.where(crosses, np.sign(side_curr - side_prev), 0).astype(np.int8)
+
+    def _inside_polygons(self, points):
+        """Return (T, P) point-in-polygon flags using the even-odd rule"""
+        px = points[:, None, 0]
+        py = points[:, None, 1]
+        x0, y0 = self.edge_start[None, :, 0], self.edge_start[None, :, 1]
+        x1, y1 = self.edge_end[None, :, 0], self.edge_end[None, :, 1]
+
+        straddles = (y0 > py) != (y1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at_y = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        hits = (straddles & (px < x_at_y)).astype(np.intp)
+        return (np.add.reduceat(hits, self.polygon_offsets, axis=1) % 2).astype(bool)
+
+    def update(self, track_ids, centroids):
+        """Test this frame's tracks against all zones.
+
+        Returns a list of (track_id, zone_name, direction) events. Tracks
+        seen for the first time only record their position, so a car first
+        detected past a line never counts as crossing it.
+        """
+        centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+        known = [i for i, track_id in enumerate(track_ids) if track_id in self.prev_centroids]
+        events = []
+
+        if known:
+            ids = [track_ids[i] for i in known]
+            curr = centroids[known]
+            prev = np.array([self.prev_centroids[track_ids[i]] for i in known], dtype=np.float64)
+
+            if self.line_names:
+                signs = self._line_crossings(prev, curr)
+                for t, l in zip(*np.nonzero(signs)):
+                    direction = 'in' if signs[t, l] > 0 else 'out'
+                    if self.line_directions[l] in ('both', direction):
+                        events.append((ids[t], self.line_names[l], direction))
+
+            if self.polygon_names:
+                changed = self._inside_polygons(curr).astype(np.int8) - self._inside_polygons(prev)
+                for t, p in zip(*np.nonzero(changed)):
+                    direction = 'in' if changed[t, p] > 0 else 'out'
+                    if self.polygon_directions[p] in ('both', direction):
+                        events.append((ids[t], self.polygon_names[p], direction))
+
+        # Remember current positions and forget tracks missing for too long
+        self.frame_number += 1
+        for track_id, c in zip(track_ids, centroids):
+            self.prev_centroids[track_id] = tuple(c)
+            self.last_seen[track_id] = self.frame_number
+        stale = [t for t, seen in self.last_seen.items() if self.frame_number - seen > self.max_age]
+        for track_id in stale:
+            del self.prev_centroids[track_id]
+            del self.last_seen[track_id]
+        return events
+
+    def draw(self, frame, color=(0, 0, 255)):
+        """Draw all zones on frame"""
+        for zone in self.zones:
+            points = np.round(zone['points']).astype(np.int32)
+            if zone['type'] == 'line':
+                cv2.line(frame, tuple(points[0]), tuple(points[1]), color, 3)
+            else:
+                cv2.polylines(frame, [points.reshape(-1, 1, 2)], True, color, 2)
+            label_x, label_y = points.min(axis=0)
+            cv2.putText(frame, f"{zone['name']} ({zone['direction']})", (int(label_x) + 5, int(label_y) - 8),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return frame
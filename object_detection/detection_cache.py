@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def get_cache_config():
+    """Get detection cache configuration"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    config = {
+        'record': os.getenv('DETECTION_CACHE_RECORD', 'False').lower() == 'true',
+        'cache_dir': os.getenv('DETECTION_CACHE_DIR', 'detection_cache')
+    }
+
+    # Make cache path absolute if relative
+    if not os.path.isabs(config['cache_dir']):
+        config['cache_dir'] = os.path.join(project_root, config['cache_dir'])
+
+    return config
+
+def video_fingerprint(video_path, chunk_size=4 * 1024 * 1024):
+    """Hash the size plus first and last chunks, fast even for long videos"""
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode('utf-8'))
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(chunk_size, size - chunk_size))
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()[:16]
+
+def cache_path(video_path, settings, cache_dir=None):
+    """Cache file for a video and the detector settings that shape its output"""
+    if cache_dir is None:
+        cache_dir = get_cache_config()['cache_dir']
+    settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{video_fingerprint(video_path)}_{settings_hash}.npz")
+
+def detection_settings(detector, process_every_n_frames):
+    """Settings that change what detect_cars returns for a video"""
+    return {
+        'model': os.path.basename(detector.model_path),
+        'confidence_threshold': detector.confidence_threshold,
+        'yolo_image_size': detector.yolo_image_size,
+        'process_every_n_frames': process_every_n_frames
+    }
+
+def partial_path(path):
+    """Where a partial recording goes when a complete one already exists"""
+    return os.path.splitext(path)[0] + '.partial.npz'
+
+def is_complete_cache(path):
+    """Whether path holds a recording of the whole video"""
+    try:
+        with np.load(path) as data:
+            return json.loads(str(data['metadata'])).get('complete', False)
+    except (OSError, KeyError, ValueError):
+        return False
+
+class DetectionRecorder:
+    """Collects detect_cars output per frame and writes it as columnar .npz.
+
+    Frame i's detections are rows offsets[i]:offsets[i + 1] of the
+    boxes/confs/track_ids columns; a missing track ID is stored as -1.
+    The caller sets complete once the whole video has been read; a
+    partial recording never replaces a complete one under the same key.
+    """
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = metadata
+        self.complete = False
+        self.frames_read = 0
+        self.frame_indices = []
+        self.counts = []
+        self.rows = []
+
+    def add(self, frame_index, detections):
+        self.frame_indices.append(frame_index)
+        self.counts.append(len(detections))
+        self.rows.extend(detections)
+
+    def save(self):
+        rows = self.rows
+        offsets = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=offsets[1:])
+        metadata = dict(self.metadata, complete=self.complete, frames_read=self.frames_read)
+
+        path = self.path
+        if not self.complete and is_complete_cache(path):
+            path = partial_path(path)
+            logging.warning(f"Recording stopped early, kept complete cache and saved partial one to {path}")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            frame_indices=np.array(self.frame_indices, dtype=np.int64),
+            offsets=offsets,
+            boxes=np.array([r[:4] for r in rows], dtype=np.int32).reshape(-1, 4),
+            confs=np.array([r[4] for r in rows], dtype=np.float32),
+            track_ids=np.array([-1 if r[5] is None else r[5] for r in rows], dtype=np.int64),
+            metadata=np.array(json.dumps(metadata))
+        )
+        os.replace(tmp_path, path)
+        status = "complete" if self.complete else "partial"
+        logging.info(f"Saved {len(self.frame_indices)} frames of detections ({status}) to {path}")
+
+class DetectionCache:
+    """Read-only view of a recorded detection cache"""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.frame_indices = data['frame_indices']
+            self.offsets = data['offsets']
+            self.boxes = data['boxes']
+            self.confs = data['confs']
+            self.track_ids = data['track_ids']
+            self.metadata = json.loads(str(data['metadata']))
+
+    @property
+    def complete(self):
+        """False when recording stopped before the end of the video"""
+        return self.metadata.get('complete', False)
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    def frames(self, use_track_ids=True):
+        """Yield (frame_index, detections) in the detect_cars tuple format"""
+        # Convert columns to Python lists once; per-frame slicing is then cheap
+        boxes = self.boxes.tolist()
+        confs = self.confs.tolist()
+        track_ids = self.track_ids.tolist() if use_track_ids else [-1] * len(confs)
+        offsets = self.offsets.tolist()
+
+        for i, frame_index in enumerate(self.frame_indices.tolist()):
+            detections = []
+            for j in range(offsets[i], offsets[i + 1]):
+                x1, y1, x2, y2 = boxes[j]
+                track_id = track_ids[j] if track_ids[j] >= 0 else None
+                detections.append((x1, y1, x2, y2, confs[j], track_id))
+            yield frame_index, detections
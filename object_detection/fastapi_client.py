@@ -1,12 +1,12 @@
-import requests
-import base64
 import cv2
 import logging
 import os
-import threading
+import uuid
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from license_plate_detector import LicensePlateDetector
+from outbox import Outbox
 
 load_dotenv()
 
@@ -14,6 +14,8 @@ def get_api_config():
     """Get API configuration"""
     return {
         'api_url': os.getenv('FASTAPI_URL', 'http://localhost:8000/car-crossing'),
+        'batch_url': os.getenv('FASTAPI_BATCH_URL', ''),
+        'spool_workers': int(os.getenv('SPOOL_WORKERS', 2)),
         'debug': os.getenv('DEBUG', 'False').lower() == 'true'
     }
 
@@ -21,13 +23,27 @@ class FastAPIClient:
     def __init__(self):
         config = get_api_config()
         self.api_url = config['api_url']
+        self.batch_url = config['batch_url'] or self.api_url.rstrip('/') + '/batch'
         self.debug = config['debug']
         self.lp_detector = LicensePlateDetector()
-        self.lp_detector.load_model()
+        
+        # Plate detection and encoding run here before images reach the spool
+        self.spool_executor = ThreadPoolExecutor(max_workers=config['spool_workers'])
+        
+        # Crossings are spooled to disk and replayed in batches by the outbox
+        self.outbox = Outbox(self.batch_url)
+        self.outbox.start()
     
-    def send_crossing_image(self, frame, timestamp, car_id=None):
-        """Send car image with license plate detection in background thread"""
-        def _send_async():
+    def load_model(self):
+        """Load the license plate model used before sending images"""
+        return self.lp_detector.load_model()
+    
+    def send_crossing_image(self, frame, timestamp, car_id=None, zone=None, direction=None):
+        """Queue car image with license plate detection in background worker"""
+        # Generated up front so a replayed upload can be recognised by the server
+        idempotency_key = uuid.uuid4().hex
+        
+        def _spool_async():
             try:
                 # Detect license plate
                 license_plate = self.lp_detector.detect_license_plate(frame)
@@ -36,29 +52,35 @@ class FastAPIClient:
                 combined_image = self._create_combined_view(frame, license_plate)
                 
                 _, buffer = cv2.imencode('.jpg', combined_image)
-                img_base64 = base64.b64encode(buffer).decode('utf-8')
                 
-                data = {
-                    "image": img_base64, 
+                metadata = {
                     "timestamp": timestamp,
                     "car_id": car_id,
-                    "has_license_plate": license_plate is not None
+                    "has_license_plate": license_plate is not None,
+                    "zone": zone,
+                    "direction": direction,
+                    "idempotency_key": idempotency_key
                 }
                 
-                response = requests.post(self.api_url, json=data, timeout=3)
+                self.outbox.put(buffer.tobytes(), metadata)
                 
-                if response.status_code == 200:
-                    lp_status = "with license plate" if license_plate is not None else "no license plate"
-                    logging.info(f"Car {car_id} image sent successfully at {timestamp:.2f}s ({lp_status})")
-                else:
-                    logging.error(f"Failed to send image: {response.status_code}")
+                lp_status = "with license plate" if license_plate is not None else "no license plate"
+                logging.info(f"Car {car_id} image queued at {timestamp:.2f}s ({lp_status})")
                     
             except Exception as e:
-                logging.error(f"Error sending to FastAPI: {e}")
+                logging.error(f"Error queueing image for FastAPI: {e}")
         
-        thread = threading.Thread(target=_send_async, daemon=True)
-        thread.start()
+        self.spool_executor.submit(_spool_async)
         return True
+    
+    def close(self, timeout=5.0):
+        """Finish spooling queued crossings, then stop the outbox sender.
+        
+        Unsent images remain spooled on disk for the next run.
+        """
+        self.spool_executor.shutdown(wait=True)
+        self.outbox.stop(timeout)
+    
     def _create_combined_view(self, car_image, license_plate):
         """Create combined view of car and license plate"""
         if license_plate is None:
@@ -1,7 +1,7 @@
 import cv2
 import os
-from ultralytics import YOLO
 from dotenv import load_dotenv
+from model_loader import load_yolo, warm_up
 
 load_dotenv()
 
@@ -15,22 +15,29 @@ class LicensePlateDetector:
         else:
             self.model_path = model_path
         self.confidence_threshold = float(os.getenv('LP_CONFIDENCE_THRESHOLD', 0.3))
+        self.image_size = int(os.getenv('LP_IMAGE_SIZE', 640))
         
     def load_model(self):
         """Load license plate detection model"""
         try:
-            self.model = YOLO(self.model_path)
+            self.model = load_yolo(self.model_path, self.image_size, fuse=False)
             return True
         except Exception as e:
             print(f"Error loading license plate model: {e}")
             return False
     
+    def warm_up(self):
+        """Run warm-up inferences, returns seconds spent"""
+        if self.model is None:
+            return 0.0
+        return warm_up(self.model, self.image_size)
+    
     def detect_license_plate(self, car_image):
         """Detect license plate in car image and return cropped plate"""
         if self.model is None:
             return None
             
-        results = self.model(source=car_image, conf=self.confidence_threshold, verbose=False)
+        results = self.model(source=car_image, imgsz=self.image_size, conf=self.confidence_threshold, verbose=False)
         
         for result in results:
             boxes = result.boxes
@@ -0,0 +1,99 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Exporting uses process-wide torch/ONNX state, so only one export runs at a time
+_export_lock = threading.Lock()
+
+def get_model_cache_config():
+    """Get model cache and warm-up configuration"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    config = {
+        'cache_dir': os.getenv('MODEL_CACHE_DIR', 'models/cache'),
+        'export_format': os.getenv('MODEL_EXPORT_FORMAT', '').strip().lower(),
+        'warmup_iterations': int(os.getenv('WARMUP_ITERATIONS', 2))
+    }
+
+    # Make cache path absolute if relative
+    if not os.path.isabs(config['cache_dir']):
+        config['cache_dir'] = os.path.join(project_root, config['cache_dir'])
+
+    return config
+
+def _cache_dir_for(model_path, imgsz, export_format, cache_dir):
+    """Build a cache directory that changes whenever the source weights change"""
+    stat = os.stat(model_path)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{name}_{imgsz}_{stat.st_size}_{stat.st_mtime_ns}_{export_format}")
+
+def load_yolo(model_path, imgsz, fuse=True):
+    """Load a YOLO model, using a cached exported artifact when configured"""
+    # Imported here so processes that never run inference skip torch/ultralytics
+    from ultralytics import YOLO
+
+    config = get_model_cache_config()
+    export_format = config['export_format']
+
+    if not export_format or export_format == 'pt':
+        model = YOLO(model_path)
+        if fuse:
+            model.fuse()
+        return model
+
+    # The artifact keeps its exported name so ultralytics can infer the backend.
+    # Entries only appear via an atomic rename, so an existing one is complete.
+    entry_dir = _cache_dir_for(model_path, imgsz, export_format, config['cache_dir'])
+    with _export_lock:
+        if not os.path.isdir(entry_dir):
+            _export_to_cache(model_path, imgsz, export_format, fuse, config['cache_dir'], entry_dir)
+
+    cached_path = os.path.join(entry_dir, os.listdir(entry_dir)[0])
+    logging.info(f"Loading cached {export_format} model: {cached_path}")
+    return YOLO(cached_path, task='detect')
+
+def _export_to_cache(model_path, imgsz, export_format, fuse, cache_dir, entry_dir):
+    """Export a model in a scratch directory, then rename it into entry_dir"""
+    from ultralytics import YOLO
+
+    os.makedirs(cache_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.export_', dir=cache_dir)
+    try:
+        # ultralytics writes the export next to the weights, so export a copy
+        source_path = os.path.join(work_dir, os.path.basename(model_path))
+        shutil.copy2(model_path, source_path)
+        model = YOLO(source_path)
+        if fuse:
+            model.fuse()
+        exported_path = str(model.export(format=export_format, imgsz=imgsz, verbose=False)).rstrip(os.sep)
+
+        staging_dir = os.path.join(work_dir, 'entry')
+        os.makedirs(staging_dir)
+        os.replace(exported_path, os.path.join(staging_dir, os.path.basename(exported_path)))
+        try:
+            os.replace(staging_dir, entry_dir)
+        except OSError:
+            # Another process published the same entry first
+            if not os.path.isdir(entry_dir):
+                raise
+        logging.info(f"Cached {export_format} model: {entry_dir}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def warm_up(model, imgsz, iterations=None):
+    """Run dummy inferences so the first real frame does not pay one-time costs"""
+    if iterations is None:
+        iterations = get_model_cache_config()['warmup_iterations']
+
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model.predict(source=dummy, imgsz=imgsz, verbose=False)
+    return time.perf_counter() - start
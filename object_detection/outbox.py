@@ -0,0 +1,227 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def get_outbox_config():
+    """Get outbox configuration"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    config = {
+        'outbox_dir': os.getenv('OUTBOX_DIR', 'outbox'),
+        'max_bytes': int(os.getenv('OUTBOX_MAX_BYTES', 500 * 1024 * 1024)),
+        'batch_size': int(os.getenv('OUTBOX_BATCH_SIZE', 10)),
+        'request_timeout': float(os.getenv('OUTBOX_REQUEST_TIMEOUT', 5.0)),
+        'initial_backoff': float(os.getenv('OUTBOX_INITIAL_BACKOFF', 1.0)),
+        'max_backoff': float(os.getenv('OUTBOX_MAX_BACKOFF', 60.0))
+    }
+
+    # Make outbox path absolute if relative
+    if not os.path.isabs(config['outbox_dir']):
+        config['outbox_dir'] = os.path.join(project_root, config['outbox_dir'])
+
+    return config
+
+class Outbox:
+    """Disk-backed spool of crossing images that survives API outages.
+
+    Each entry is an encoded JPEG plus a JSON metadata file, named by a
+    monotonically increasing sequence so the spool drains oldest first.
+    The metadata file is written last, so an entry only becomes visible
+    to the sender once both files are complete on disk.
+    """
+
+    def __init__(self, batch_url):
+        config = get_outbox_config()
+        self.batch_url = batch_url
+        self.outbox_dir = config['outbox_dir']
+        self.max_bytes = config['max_bytes']
+        self.batch_size = config['batch_size']
+        self.request_timeout = config['request_timeout']
+        self.initial_backoff = config['initial_backoff']
+        self.max_backoff = config['max_backoff']
+
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # Running size of the spool, so put() never has to stat every entry
+        self._total_bytes = self._recover()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._sender = None
+
+    def start(self):
+        """Start the background sender thread"""
+        if self._sender is None or not self._sender.is_alive():
+            self._stop.clear()
+            self._sender = threading.Thread(target=self._run, daemon=True)
+            self._sender.start()
+
+    def stop(self, timeout=None):
+        """Stop the background sender; spooled entries stay on disk"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._sender is not None:
+            self._sender.join(timeout)
+
+    def put(self, jpeg_bytes, metadata):
+        """Spool one encoded image with its metadata, returns the idempotency key"""
+        key = metadata.get('idempotency_key') or uuid.uuid4().hex
+        metadata = dict(metadata, idempotency_key=key)
+        name = f"{time.time_ns():020d}_{key}"
+        image_path = os.path.join(self.outbox_dir, name + '.jpg')
+        meta_path = os.path.join(self.outbox_dir, name + '.json')
+
+        # Entry names are unique, so the writes need no lock; the metadata file
+        # goes last and is what makes the entry visible to the sender
+        meta_bytes = json.dumps(metadata).encode('utf-8')
+        self._write_atomic(image_path, jpeg_bytes)
+        self._write_atomic(meta_path, meta_bytes)
+
+        with self._lock:
+            self._total_bytes += len(jpeg_bytes) + len(meta_bytes)
+            if self._total_bytes > self.max_bytes:
+                self._enforce_size_cap()
+
+        self._wakeup.set()
+        return key
+
+    def pending(self):
+        """Return spooled entry names, oldest first"""
+        return sorted(f[:-5] for f in os.listdir(self.outbox_dir) if f.endswith('.json'))
+
+    def _write_atomic(self, path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _recover(self):
+        """Delete files left by a crash and return the size of the spool"""
+        files = set(os.listdir(self.outbox_dir))
+        total = 0
+        for f in files:
+            path = os.path.join(self.outbox_dir, f)
+            name, ext = os.path.splitext(f)
+            # A half-written file, or one half of an entry whose partner is missing
+            orphan = (
+                ext == '.tmp'
+                or (ext == '.jpg' and name + '.json' not in files)
+                or (ext == '.json' and name + '.jpg' not in files)
+            )
+            if orphan:
+                logging.warning(f"Removing orphaned outbox file {f}")
+                os.remove(path)
+            else:
+                total += os.path.getsize(path)
+        return total
+
+    def _remove(self, name):
+        """Delete an entry and take it off the running size; call with the lock held"""
+        for ext in ('.json', '.jpg'):
+            path = os.path.join(self.outbox_dir, name + ext)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def _enforce_size_cap(self):
+        """Drop the oldest entries until the spool fits in max_bytes"""
+        for name in self.pending():
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(name)
+            logging.warning(f"Outbox full, dropped oldest entry {name}")
+
+    def _load_batch(self):
+        """Read up to batch_size entries from disk"""
+        batch = []
+        for name in self.pending()[:self.batch_size]:
+            try:
+                with open(os.path.join(self.outbox_dir, name + '.json'), 'rb') as f:
+                    metadata = json.loads(f.read().decode('utf-8'))
+                with open(os.path.join(self.outbox_dir, name + '.jpg'), 'rb') as f:
+                    jpeg_bytes = f.read()
+            except (OSError, ValueError) as e:
+                logging.error(f"Discarding unreadable outbox entry {name}: {e}")
+                self._remove(name)
+                continue
+            batch.append((name, jpeg_bytes, metadata))
+        return batch
+
+    def _send_batch(self, batch):
+        """Post a batch, returns the names the server is done with"""
+        items = [
+            dict(metadata, image=base64.b64encode(jpeg_bytes).decode('utf-8'))
+            for _, jpeg_bytes, metadata in batch
+        ]
+        response = requests.post(self.batch_url, json={"items": items}, timeout=self.request_timeout)
+        if response.status_code != 200:
+            logging.error(f"Outbox batch rejected: {response.status_code}")
+            return []
+
+        results = response.json().get("results", [])
+        done = []
+        for (name, _, _), result in zip(batch, results):
+            status = result.get("status")
+            if status in ("success", "duplicate"):
+                done.append(name)
+            elif status == "invalid":
+                # Retrying cannot fix an entry the server refuses outright
+                logging.error(f"Outbox entry {name} rejected as invalid: {result.get('message')}")
+                done.append(name)
+            else:
+                logging.error(f"Outbox entry {name} not saved by server: {result.get('message')}")
+        return done
+
+    def drain(self):
+        """Send spooled entries until the outbox is empty or a send fails"""
+        while not self._stop.is_set():
+            with self._lock:
+                batch = self._load_batch()
+            if not batch:
+                return True
+
+            try:
+                done = self._send_batch(batch)
+            except (requests.RequestException, ValueError) as e:
+                logging.error(f"Error sending outbox batch: {e}")
+                done = []
+
+            with self._lock:
+                for name in done:
+                    self._remove(name)
+            if done:
+                logging.info(f"Outbox sent {len(done)} image(s)")
+
+            # Entries the server did not save stay spooled for the next retry
+            if len(done) < len(batch):
+                return False
+        return False
+
+    def _run(self):
+        backoff = self.initial_backoff
+        while not self._stop.is_set():
+            if self.drain():
+                backoff = self.initial_backoff
+                self._wakeup.wait()
+            else:
+                if self._stop.is_set():
+                    break
+                # Exponential backoff while the server is unreachable; new
+                # entries do not cut the wait short
+                logging.info(f"Outbox retrying in {backoff:.1f}s ({len(self.pending())} pending)")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            self._wakeup.clear()
+
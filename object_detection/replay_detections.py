@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Replay recorded detections to tune tracking/crossing settings without YOLO
+
+Record once with DETECTION_CACHE_RECORD=True and main.py, then sweep, e.g.:
+    python replay_detections.py --line-position 0.6,0.7,0.8 --min-car-height 300,500
+"""
+
+import argparse
+import itertools
+import logging
+import sys
+import time
+import numpy as np
+from car_detector import CarDetector
+from detection_cache import DetectionCache, cache_path, detection_settings
+from video_handler import DEFAULT_FPS, get_video_config
+
+def parse_list(value, cast):
+    """Parse a comma separated list of values"""
+    return [cast(v) for v in value.split(',')]
+
+def replay(cache, line_position, centroid_threshold, crop_padding, min_car_height, use_track_ids):
+    """Run the crossing pipeline over cached detections, returns a result dict"""
+    metadata = cache.metadata
+    frame_width = metadata['frame_width']
+    frame_height = metadata['frame_height']
+    fps = metadata['fps'] if metadata.get('fps', 0) > 0 else DEFAULT_FPS
+    line_y = int(frame_height * line_position)
+
+    detector = CarDetector()
+    detector.centroid_distance_threshold = centroid_threshold
+    detector.crop_padding = crop_padding
+    detector.min_car_height = min_car_height
+    detector.setup_zones(frame_width, frame_height, line_y)
+
+    # crop_car only needs the frame's shape and slicing, not real pixels
+    blank_frame = np.broadcast_to(np.zeros(1, dtype=np.uint8), (frame_height, frame_width, 3))
+
+    crossings = 0
+    accepted = 0
+    start = time.perf_counter()
+    for frame_index, detections in cache.frames(use_track_ids):
+        for x1, y1, x2, y2, conf, ts, car_id, zone, direction in detector.check_line_crossing(
+                detections, line_y, frame_index / fps):
+            crossings += 1
+            if detector.crop_car(blank_frame, x1, y1, x2, y2) is not None:
+                accepted += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'crossings': crossings,
+        'accepted': accepted,
+        'rejected': crossings - accepted,
+        'replay_fps': len(cache) / elapsed if elapsed > 0 else float('inf')
+    }
+
+def main():
+    video_config = get_video_config()
+    defaults = CarDetector()
+
+    parser = argparse.ArgumentParser(description="Replay cached detections with different settings")
+    parser.add_argument('--cache', help="Detection cache file (default: derived from --video and settings)")
+    parser.add_argument('--video', default=video_config['video_path'], help="Recorded video")
+    parser.add_argument('--line-position', default=str(video_config['detection_line_position']),
+                        help="Comma separated DETECTION_LINE_POSITION values")
+    parser.add_argument('--centroid-threshold', default=str(defaults.centroid_distance_threshold),
+                        help="Comma separated CENTROID_DISTANCE_THRESHOLD values")
+    parser.add_argument('--crop-padding', default=str(defaults.crop_padding),
+                        help="Comma separated CROP_PADDING values")
+    parser.add_argument('--min-car-height', default=str(defaults.min_car_height),
+                        help="Comma separated MIN_CAR_HEIGHT values")
+    parser.add_argument('--ignore-track-ids', action='store_true',
+                        help="Drop cached ByteTrack IDs and use centroid tracking instead")
+    args = parser.parse_args()
+
+    path = args.cache
+    if path is None:
+        settings = detection_settings(defaults, video_config['process_every_n_frames'])
+        path = cache_path(args.video, settings)
+
+    try:
+        cache = DetectionCache(path)
+    except FileNotFoundError:
+        print(f" Error: Detection cache not found: {path}")
+        print(" Record one first with DETECTION_CACHE_RECORD=True python main.py")
+        return 1
+
+    print(f" Replaying {len(cache)} frames from {path}")
+    if not cache.complete:
+        metadata = cache.metadata
+        print(f" Warning: partial recording, stopped after {metadata.get('frames_read', '?')} "
+              f"of {metadata.get('video_frame_count', '?')} frames; results cover only that part")
+    logging.disable(logging.INFO)
+
+    sweep = itertools.product(
+        parse_list(args.line_position, float),
+        parse_list(args.centroid_threshold, int),
+        parse_list(args.crop_padding, int),
+        parse_list(args.min_car_height, int)
+    )
+    print(f" {'line':>6} {'centroid':>8} {'padding':>7} {'min_h':>6} | {'crossings':>9} {'accepted':>8} {'rejected':>8} {'fps':>9}")
+    for line_position, centroid_threshold, crop_padding, min_car_height in sweep:
+        result = replay(cache, line_position, centroid_threshold, crop_padding, min_car_height,
+                        not args.ignore_track_ids)
+        print(f" {line_position:>6.2f} {centroid_threshold:>8} {crop_padding:>7} {min_car_height:>6} | "
+              f"{result['crossings']:>9} {result['accepted']:>8} {result['rejected']:>8} {result['replay_fps']:>9.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,18 @@
 import cv2
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from car_detector import CarDetector, get_env_config
 from fastapi_client import FastAPIClient
+from detection_cache import DetectionRecorder, cache_path, detection_settings, get_cache_config
 
 load_dotenv()
 
+# Used when OpenCV cannot report the video's frame rate
+DEFAULT_FPS = 30.0
+
 def get_video_config():
     """Get video-specific configuration"""
     return {
@@ -23,6 +29,8 @@ class VideoHandler:
         self.detector = CarDetector()
         self.api_client = FastAPIClient()
         self.cap = None
+        self.startup_timings = {}
+        self.recorder = None
         
         # Load configuration without exposing values
         config = get_video_config()
@@ -33,29 +41,90 @@ class VideoHandler:
         self.display_width = config['display_width']
         self.display_height = config['display_height']
         
+    def _timed(self, name, func):
+        """Run func and record its duration in the startup timings"""
+        start = time.perf_counter()
+        result = func()
+        self.startup_timings[name] = time.perf_counter() - start
+        return result
+    
+    def _load_car_model(self):
+        if not self._timed('car_model_load', self.detector.load_model):
+            return False
+        self._timed('car_model_warmup', self.detector.warm_up)
+        return True
+    
+    def _load_plate_model(self):
+        if not self._timed('plate_model_load', self.api_client.load_model):
+            return False
+        self._timed('plate_model_warmup', self.api_client.lp_detector.warm_up)
+        return True
+    
     def initialize(self):
-        if not self.detector.load_model():
+        start = time.perf_counter()
+        
+        # Load and warm up both models in parallel
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            car_future = executor.submit(self._load_car_model)
+            plate_future = executor.submit(self._load_plate_model)
+            car_loaded = car_future.result()
+            plate_loaded = plate_future.result()
+        self.startup_timings['models_total'] = time.perf_counter() - start
+        
+        if not car_loaded:
             return False
+        if not plate_loaded:
+            logging.warning("License plate model not loaded, images will be sent without plates")
             
-        self.cap = cv2.VideoCapture(self.video_path)
+        self.cap = self._timed('video_open', lambda: cv2.VideoCapture(self.video_path))
         if not self.cap.isOpened():
             print(f"Error: Could not open video file {self.video_path}")
             return False
+        
+        self.startup_timings['total'] = time.perf_counter() - start
+        self._report_startup_timings()
             
         print("Video opened successfully. Processing...")
         return True
     
+    def _report_startup_timings(self):
+        """Log the startup timing breakdown"""
+        breakdown = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self.startup_timings.items())
+        logging.info(f"Startup timings: {breakdown}")
+        if self.detector.verbose:
+            print(f"Startup timings: {breakdown}")
+    
     def process_video(self):
         if self.cap is None:
             return
-            
+        
+        # Always clean up, so Ctrl-C or an error still saves any recording
+        try:
+            self._process_frames()
+        finally:
+            self.cleanup()
+    
+    def _process_frames(self):
         frame_count = 0
         fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if not fps > 0:
+            logging.warning(f"Video reports no frame rate, assuming {DEFAULT_FPS} fps")
+            fps = DEFAULT_FPS
+        frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         line_y = int(frame_height * self.detection_line_position)
+        self.detector.setup_zones(frame_width, frame_height, line_y)
+        
+        # Optionally record raw detections for offline replay/tuning
+        cache_config = get_cache_config()
+        if cache_config['record']:
+            settings = detection_settings(self.detector, self.process_every_n_frames)
+            metadata = dict(settings, fps=fps, frame_width=frame_width, frame_height=frame_height,
+                            video_frame_count=int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+            path = cache_path(self.video_path, settings, cache_config['cache_dir'])
+            self.recorder = DetectionRecorder(path, metadata)
         
         # FPS calculation variables
-        import time
         prev_time = time.time()
         fps_counter = 0
         display_fps = 0
@@ -63,9 +132,14 @@ class VideoHandler:
         while self.cap.isOpened():
             ret, frame = self.cap.read()
             if not ret:
+                # Reached the end of the video, so any recording is complete
+                if self.recorder is not None:
+                    self.recorder.complete = True
                 break
                 
             frame_count += 1
+            if self.recorder is not None:
+                self.recorder.frames_read = frame_count
             timestamp = frame_count / fps
             
             # Keep original clean frame for cropping
@@ -74,19 +148,21 @@ class VideoHandler:
             if frame_count % self.process_every_n_frames == 0:
                 detections = self.detector.detect_cars(frame)
                 self.detector.last_detections = detections
+                if self.recorder is not None:
+                    self.recorder.add(frame_count, detections)
                 
                 crossings = self.detector.check_line_crossing(detections, line_y, timestamp)
                 
                 for crossing in crossings:
-                    x1, y1, x2, y2, conf, ts, car_id = crossing
-                    logging.info(f"Car {car_id} crossed line at timestamp: {ts:.2f}s")
+                    x1, y1, x2, y2, conf, ts, car_id, zone, direction = crossing
+                    logging.info(f"Car {car_id} crossed {zone} ({direction}) at timestamp: {ts:.2f}s")
                     
                     # Crop from original clean frame (no bboxes/lines)
                     cropped_car = self.detector.crop_car(original_frame, x1, y1, x2, y2)
                     
                     # Only send if crop meets quality requirements
                     if cropped_car is not None:
-                        self.api_client.send_crossing_image(cropped_car, ts, car_id)
+                        self.api_client.send_crossing_image(cropped_car, ts, car_id, zone, direction)
                     else:
                         logging.info(f"Car {car_id} rejected - image too small")
             
@@ -111,11 +187,13 @@ class VideoHandler:
             
             if cv2.waitKey(self.video_display_delay) & 0xFF == ord('q'):
                 break
-        
-        self.cleanup()
     
     def cleanup(self):
         if self.cap:
             self.cap.release()
+        if self.recorder is not None:
+            self.recorder.save()
+            self.recorder = None
+        self.api_client.close()
         cv2.destroyAllWindows()
         print("Video processing finished.")
\ No newline at end of file
@@ -3,16 +3,23 @@
 FastAPI Server with direct .env configuration
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import FileResponse, HTMLResponse
 from pydantic import BaseModel
+from typing import List
+import argparse
 import base64
+import binascii
 import cv2
+import html
 import numpy as np
 import os
+import re
+import uuid
 import uvicorn
 from datetime import datetime
 from dotenv import load_dotenv
+from shared_state import SharedState
 
 # Load environment variables
 load_dotenv()
@@ -21,14 +28,21 @@ load_dotenv()
 FASTAPI_HOST = os.getenv('FASTAPI_HOST', '127.0.0.1')
 FASTAPI_PORT = int(os.getenv('FASTAPI_PORT', 8000))
 IMAGES_FOLDER = os.getenv('IMAGES_FOLDER', 'car_crossing_images')
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 1))
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 VERBOSE = os.getenv('VERBOSE', 'False').lower() == 'true'
 
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # Make images folder path absolute from project root
 if not os.path.isabs(IMAGES_FOLDER):
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     IMAGES_FOLDER = os.path.join(project_root, IMAGES_FOLDER)
 
+# Shared state database lives next to the images unless configured otherwise
+STATE_DB_PATH = os.getenv('STATE_DB_PATH') or os.path.join(IMAGES_FOLDER, 'server_state.db')
+if not os.path.isabs(STATE_DB_PATH):
+    STATE_DB_PATH = os.path.join(project_root, STATE_DB_PATH)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Car Detection API",
@@ -39,14 +53,38 @@ app = FastAPI(
 # Create images folder
 os.makedirs(IMAGES_FOLDER, exist_ok=True)
 
-# Global counter
-image_count = 0
+def load_seen_keys():
+    """Recover idempotency keys of already saved images from their filenames"""
+    # Format: car1_20241127_161408_<key>_<token>_24.72s.jpg (older files have no token)
+    keys = set()
+    for f in os.listdir(IMAGES_FOLDER):
+        parts = f.split('_')
+        if f.endswith('.jpg') and len(parts) in (5, 6):
+            keys.add(parts[3])
+    return keys
+
+# Counters and idempotency keys shared across worker processes, so client
+# replays are not stored twice and /status totals cover every worker
+state = SharedState(STATE_DB_PATH)
+state.seed_keys(load_seen_keys())
+
+# Keys end up in filenames and the gallery HTML, so only allow UUID-like keys
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[0-9a-f-]{1,64}$')
+
+class InvalidImageError(ValueError):
+    """Image data that can never be decoded, so a retry cannot help"""
 
 class ImageData(BaseModel):
     image: str
     timestamp: float
     car_id: int = None
     has_license_plate: bool = False
+    zone: str = None
+    direction: str = None
+    idempotency_key: str = None
+
+class ImageBatch(BaseModel):
+    items: List[ImageData]
 
 @app.get("/")
 def root():
@@ -63,7 +101,7 @@ def get_status():
     image_files = [f for f in os.listdir(IMAGES_FOLDER) if f.endswith('.jpg')]
     return {
         "server_status": "running",
-        "total_images_received": image_count,
+        "total_images_received": state.image_count(),
         "images_in_folder": len(image_files),
         "latest_images": sorted(image_files)[-5:] if image_files else []
     }
@@ -114,6 +152,7 @@ def image_gallery():
     """
     
     for img in image_files:
+        img = html.escape(img, quote=True)
         try:
             # Extract car ID and timestamp from filename
             # Format: car1_20241127_161408_24.72s.jpg
@@ -145,56 +184,155 @@ def image_gallery():
     
     return html_content
 
+def validate_key(data: ImageData):
+    """Return an error message if the idempotency key is not allowed"""
+    if data.idempotency_key is not None and not IDEMPOTENCY_KEY_PATTERN.match(data.idempotency_key):
+        return "idempotency_key must match [0-9a-f-]{1,64}"
+    return None
+
+def duplicate_response(key, car_id, timestamp):
+    """Response for an image whose idempotency key was already saved"""
+    if VERBOSE:
+        print(f" Car {car_id} duplicate ignored (key {key})")
+    return {
+        "status": "duplicate",
+        "total_received": state.image_count(),
+        "timestamp": timestamp,
+        "idempotency_key": key
+    }
+
+def save_image(data: ImageData):
+    """Decode and save one car crossing image, skipping replayed duplicates"""
+    timestamp = data.timestamp
+    car_id = data.car_id or "unknown"
+    # Every image gets a key so filenames never collide across workers
+    key = data.idempotency_key or uuid.uuid4().hex
+    
+    if state.has_key(key):
+        return duplicate_response(key, car_id, timestamp)
+    
+    # Decode base64 image and check it is a valid picture
+    try:
+        img_data = base64.b64decode(data.image, validate=True)
+    except binascii.Error as e:
+        raise InvalidImageError(f"Invalid base64 image data: {e}")
+    nparr = np.frombuffer(img_data, np.uint8)
+    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR) if len(nparr) else None
+    if frame is None:
+        raise InvalidImageError("Invalid image data")
+    
+    # Generate filename with car ID; the token keeps concurrent saves of
+    # the same key by different workers on separate files
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    token = uuid.uuid4().hex[:12]
+    filename = f"{IMAGES_FOLDER}/car{car_id}_{stamp}_{key}_{token}_{timestamp:.2f}s.jpg"
+    
+    # Save the client's JPEG as-is, renamed into place once complete
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(img_data)
+    os.replace(tmp_filename, filename)
+    
+    # Record the key only once the image is on disk; if another worker
+    # recorded it meanwhile, keep theirs and drop this worker's own copy
+    total_received = state.record_image(key, filename)
+    if total_received is None:
+        os.remove(filename)
+        return duplicate_response(key, car_id, timestamp)
+    
+    lp_status = " (with license plate)" if data.has_license_plate else " (no license plate)"
+    zone_status = f" [{data.zone} {data.direction}]" if data.zone else ""
+    print(f" Car {car_id} crossing image saved: {filename}{lp_status}{zone_status}")
+    
+    return {
+        "status": "success",
+        "filename": filename,
+        "total_received": total_received,
+        "timestamp": timestamp,
+        "has_license_plate": data.has_license_plate,
+        "zone": data.zone,
+        "direction": data.direction,
+        "idempotency_key": key
+    }
+
 @app.post("/car-crossing")
-async def receive_car_image(data: ImageData):
+def receive_car_image(data: ImageData):
     """Receive and save car crossing image"""
-    global image_count
+    error = validate_key(data)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
     
     try:
-        # Decode base64 image
-        img_data = base64.b64decode(data.image)
-        nparr = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Generate filename with car ID
-        timestamp = data.timestamp
-        car_id = data.car_id or "unknown"
-        filename = f"{IMAGES_FOLDER}/car{car_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{timestamp:.2f}s.jpg"
-        
-        # Save image
-        cv2.imwrite(filename, frame)
-        
-        # Update counter
-        image_count += 1
-        
-        lp_status = " (with license plate)" if data.has_license_plate else " (no license plate)"
-        print(f" Car {car_id} crossing image saved: {filename}{lp_status}")
-        
-        return {
-            "status": "success",
-            "filename": filename,
-            "total_received": image_count,
-            "timestamp": timestamp,
-            "has_license_plate": data.has_license_plate
-        }
-        
+        return save_image(data)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         print(f" Error processing image: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.post("/car-crossing/batch")
+def receive_car_image_batch(batch: ImageBatch):
+    """Receive and save a batch of spooled car crossing images"""
+    results = []
+    for data in batch.items:
+        # Invalid items are rejected permanently, retrying cannot fix them
+        error = validate_key(data)
+        if error:
+            results.append({"status": "invalid", "message": error})
+            continue
+        try:
+            results.append(save_image(data))
+        except InvalidImageError as e:
+            results.append({"status": "invalid", "message": str(e)})
+        except Exception as e:
+            print(f" Error processing image: {e}")
+            results.append({"status": "error", "message": str(e)})
+    
+    return {
+        "status": "success",
+        "results": results,
+        "total_received": state.image_count()
+    }
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Car Detection API Server")
+    parser.add_argument('--host', default=FASTAPI_HOST, help="Host to bind")
+    parser.add_argument('--port', type=int, default=FASTAPI_PORT, help="Port to bind")
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS,
+                        help="Number of uvicorn worker processes")
+    return parser.parse_args()
+
 def main():
     """Run the FastAPI server"""
+    args = parse_args()
+    
+    # total_images_received counts from server start, as with the old
+    # in-process counter; workers start after this and share the reset value
+    state.reset_image_count()
+    
     print(" Starting Car Detection API Server...")
     print(f" Images folder: {IMAGES_FOLDER}")
-    print(f" Server URL: http://{FASTAPI_HOST}:{FASTAPI_PORT}")
-    print(f"  Gallery URL: http://{FASTAPI_HOST}:{FASTAPI_PORT}/gallery")
+    print(f" Server URL: http://{args.host}:{args.port}")
+    print(f"  Gallery URL: http://{args.host}:{args.port}/gallery")
     
-    uvicorn.run(
-        app,
-        host=FASTAPI_HOST,
-        port=FASTAPI_PORT,
-        reload=DEBUG
-    )
+    if args.workers > 1:
+        # Workers need an import string; reload is not supported with them
+        print(f" Workers: {args.workers}")
+        uvicorn.run(
+            "api_server:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            app_dir=os.path.dirname(os.path.abspath(__file__))
+        )
+    else:
+        uvicorn.run(
+            app,
+            host=args.host,
+            port=args.port,
+            reload=DEBUG
+        )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
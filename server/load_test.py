@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Ingest load test for the API server
+
+Start the server with different --workers values and compare the
+images/s reported here, e.g.:
+    python api_server.py --workers 4
+    python load_test.py --requests 2000 --concurrency 32
+"""
+
+import argparse
+import base64
+import time
+import uuid
+import cv2
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+def make_payload(image_size):
+    """Encode a random test image once, reused by every request"""
+    frame = np.random.randint(0, 256, (image_size, image_size, 3), dtype=np.uint8)
+    _, buffer = cv2.imencode('.jpg', frame)
+    return base64.b64encode(buffer).decode('utf-8')
+
+def main():
+    parser = argparse.ArgumentParser(description="Car crossing ingest load test")
+    parser.add_argument('--url', default='http://127.0.0.1:8000/car-crossing', help="Ingest endpoint")
+    parser.add_argument('--requests', type=int, default=1000, help="Total images to send")
+    parser.add_argument('--concurrency', type=int, default=16, help="Parallel senders")
+    parser.add_argument('--image-size', type=int, default=320, help="Test image side in pixels")
+    args = parser.parse_args()
+
+    image = make_payload(args.image_size)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount('http://', adapter)
+
+    def send(i):
+        data = {
+            "image": image,
+            "timestamp": i / 30.0,
+            "car_id": i % 50 + 1,
+            "has_license_plate": False,
+            "idempotency_key": uuid.uuid4().hex
+        }
+        response = session.post(args.url, json=data, timeout=30)
+        return response.status_code == 200 and response.json().get("status") == "success"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = sum(results)
+    print(f" Sent {args.requests} images in {elapsed:.2f}s")
+    print(f" Succeeded: {ok}, failed: {args.requests - ok}")
+    print(f" Throughput: {ok / elapsed:.1f} images/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import threading
+
+class SharedState:
+    """Counters and idempotency keys shared by all server worker processes.
+
+    Backed by a SQLite database in WAL mode, so every uvicorn worker sees
+    the same totals and a replayed image is recorded by exactly one worker.
+    A key is only recorded after its image is on disk, so a worker dying
+    mid-save never leaves a key without an image.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS seen_keys (key TEXT PRIMARY KEY, filename TEXT)")
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('images_received', 0)")
+        conn.commit()
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def seed_keys(self, keys):
+        """Record keys of images saved before the database existed"""
+        conn = self._connect()
+        conn.executemany("INSERT OR IGNORE INTO seen_keys (key) VALUES (?)", [(k,) for k in keys])
+        conn.commit()
+
+    def has_key(self, key):
+        """Whether an image with this idempotency key was already saved"""
+        row = self._connect().execute("SELECT 1 FROM seen_keys WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def record_image(self, key, filename):
+        """Record a saved image and count it, returns the new total.
+
+        Returns None if another worker recorded the same key first; the
+        caller then removes its copy of the file.
+        """
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO seen_keys (key, filename) VALUES (?, ?)",
+                (key, os.path.basename(filename))
+            )
+            if cursor.rowcount != 1:
+                return None
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'images_received'")
+            row = conn.execute("SELECT value FROM counters WHERE name = 'images_received'").fetchone()
+        return row[0]
+
+    def reset_image_count(self):
+        """Start counting received images from zero"""
+        conn = self._connect()
+        conn.execute("UPDATE counters SET value = 0 WHERE name = 'images_received'")
+        conn.commit()
+
+    def image_count(self):
+        """Total images received across all workers since the server started"""
+        row = self._connect().execute("SELECT value FROM counters WHERE name = 'images_received'").fetchone()
+        return row[0]
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The application modules import each other as top-level scripts
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('object_detection', 'server'):
+    sys.path.insert(0, os.path.join(project_root, folder))
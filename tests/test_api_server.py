@@ -0,0 +1,76 @@
+import base64
+import importlib
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from shared_state import SharedState
+
+def encode_image():
+    _, buffer = cv2.imencode('.jpg', np.zeros((20, 20, 3), dtype=np.uint8))
+    return base64.b64encode(buffer).decode('utf-8')
+
+def saved_images(folder):
+    return [f for f in os.listdir(folder) if f.endswith('.jpg')]
+
+@pytest.fixture
+def api_server(tmp_path, monkeypatch):
+    monkeypatch.setenv('IMAGES_FOLDER', str(tmp_path / 'images'))
+    monkeypatch.delenv('STATE_DB_PATH', raising=False)
+    import api_server
+    return importlib.reload(api_server)
+
+def test_empty_state_db_path_uses_default(tmp_path, monkeypatch):
+    # A .env line like "STATE_DB_PATH=" must not turn into a directory path
+    monkeypatch.setenv('IMAGES_FOLDER', str(tmp_path / 'images'))
+    monkeypatch.setenv('STATE_DB_PATH', '')
+    import api_server
+    api_server = importlib.reload(api_server)
+
+    assert api_server.STATE_DB_PATH == os.path.join(api_server.IMAGES_FOLDER, 'server_state.db')
+
+def test_shared_state_records_each_key_once(tmp_path):
+    state = SharedState(str(tmp_path / 'state.db'))
+    other_worker = SharedState(str(tmp_path / 'state.db'))
+
+    assert state.record_image('abc', 'a.jpg') == 1
+    assert other_worker.record_image('abc', 'b.jpg') is None
+    assert other_worker.has_key('abc')
+    assert other_worker.record_image('def', 'c.jpg') == 2
+    assert state.image_count() == 2
+
+    state.reset_image_count()
+    assert other_worker.image_count() == 0
+
+def test_replayed_key_is_saved_once(api_server):
+    data = api_server.ImageData(image=encode_image(), timestamp=1.0, car_id=1, idempotency_key='ab-12')
+
+    assert api_server.save_image(data)['status'] == 'success'
+    assert api_server.save_image(data)['status'] == 'duplicate'
+    assert len(saved_images(api_server.IMAGES_FOLDER)) == 1
+
+def test_concurrent_save_of_same_key_keeps_first_image(api_server, monkeypatch):
+    # Both workers pass the has_key check before either records the key
+    monkeypatch.setattr(api_server.state, 'has_key', lambda key: False)
+    data = api_server.ImageData(image=encode_image(), timestamp=1.0, car_id=1, idempotency_key='ab-12')
+
+    first = api_server.save_image(data)
+    second = api_server.save_image(data)
+
+    assert first['status'] == 'success'
+    assert second['status'] == 'duplicate'
+    assert saved_images(api_server.IMAGES_FOLDER) == [os.path.basename(first['filename'])]
+    assert api_server.state.image_count() == 1
+
+def test_undecodable_images_are_reported_invalid(api_server):
+    items = [
+        api_server.ImageData(image='not base64!', timestamp=1.0),
+        api_server.ImageData(image=base64.b64encode(b'not a jpeg').decode('utf-8'), timestamp=1.0),
+        api_server.ImageData(image=encode_image(), timestamp=1.0)
+    ]
+
+    response = api_server.receive_car_image_batch(api_server.ImageBatch(items=items))
+
+    assert [r['status'] for r in response['results']] == ['invalid', 'invalid', 'success']
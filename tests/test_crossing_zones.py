@@ -0,0 +1,41 @@
+import numpy as np
+
+from crossing_zones import ZoneEngine
+
+def test_track_missing_for_a_frame_still_crosses():
+    engine = ZoneEngine.from_horizontal_line(500, 1000)
+
+    assert engine.update([1], [(100, 480)]) == []
+    assert engine.update([], []) == []
+    assert engine.update([1], [(100, 520)]) == [(1, 'line', 'in')]
+    assert engine.update([1], [(100, 560)]) == []
+
+def test_track_older_than_max_age_is_forgotten():
+    engine = ZoneEngine.from_horizontal_line(500, 1000, max_age=2)
+
+    engine.update([1], [(100, 480)])
+    for _ in range(3):
+        engine.update([], [])
+    # Treated as a new track, so its first position never counts
+    assert engine.update([1], [(100, 520)]) == []
+
+def test_track_first_seen_past_line_is_not_counted():
+    engine = ZoneEngine.from_horizontal_line(500, 1000)
+
+    assert engine.update([1], [(100, 520)]) == []
+    assert engine.update([1], [(100, 560)]) == []
+
+def test_line_direction():
+    engine = ZoneEngine.from_horizontal_line(500, 1000)
+
+    engine.update([1], [(100, 480)])
+    assert engine.update([1], [(100, 520)]) == [(1, 'line', 'in')]
+    assert engine.update([1], [(100, 480)]) == [(1, 'line', 'out')]
+
+def test_polygon_enter_and_leave():
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+    engine = ZoneEngine([{'name': 'lot', 'type': 'polygon', 'points': square, 'direction': 'both'}])
+
+    engine.update([1], [(-5, 5)])
+    assert engine.update([1], [(5, 5)]) == [(1, 'lot', 'in')]
+    assert engine.update([1], [(15, 5)]) == [(1, 'lot', 'out')]
@@ -0,0 +1,43 @@
+import os
+
+from detection_cache import DetectionCache, DetectionRecorder, partial_path
+
+def record(path, frames, complete):
+    recorder = DetectionRecorder(path, {'fps': 30.0, 'frame_width': 640, 'frame_height': 480})
+    for frame_index in range(1, frames + 1):
+        recorder.add(frame_index, [(10, 20, 110, 220, 0.9, frame_index), (0, 0, 5, 5, 0.5, None)])
+    recorder.frames_read = frames
+    recorder.complete = complete
+    recorder.save()
+
+def test_round_trip_keeps_detections(tmp_path):
+    path = str(tmp_path / 'cache.npz')
+    record(path, 3, complete=True)
+
+    cache = DetectionCache(path)
+    frames = list(cache.frames())
+
+    assert cache.complete
+    assert len(cache) == 3
+    assert frames[0][0] == 1
+    assert frames[0][1][0][:4] == (10, 20, 110, 220)
+    assert frames[0][1][0][5] == 1 and frames[0][1][1][5] is None
+
+def test_partial_recording_does_not_replace_complete_cache(tmp_path):
+    path = str(tmp_path / 'cache.npz')
+    record(path, 10, complete=True)
+    record(path, 2, complete=False)
+
+    assert len(DetectionCache(path)) == 10
+    partial = DetectionCache(partial_path(path))
+    assert not partial.complete
+    assert len(partial) == 2
+
+def test_partial_recording_is_marked_when_no_cache_exists(tmp_path):
+    path = str(tmp_path / 'cache.npz')
+    record(path, 2, complete=False)
+
+    cache = DetectionCache(path)
+    assert not cache.complete
+    assert cache.metadata['frames_read'] == 2
+    assert not os.path.exists(partial_path(path))
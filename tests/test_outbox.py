@@ -0,0 +1,173 @@
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from outbox import Outbox
+
+class StandInServer:
+    """Minimal /car-crossing/batch stand-in that deduplicates by key"""
+
+    def __init__(self, port):
+        self.port = port
+        self.saved = []
+        self.fail_keys = set()
+        self.invalid_keys = set()
+        self.httpd = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                results = []
+                for item in body['items']:
+                    key = item['idempotency_key']
+                    if key in server.invalid_keys:
+                        results.append({"status": "invalid", "message": "Invalid image data"})
+                    elif key in server.fail_keys:
+                        results.append({"status": "error", "message": "disk full"})
+                    elif key in server.saved:
+                        results.append({"status": "duplicate"})
+                    else:
+                        server.saved.append(key)
+                        results.append({"status": "success"})
+                payload = json.dumps({"status": "success", "results": results}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def outbox_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('OUTBOX_DIR', str(tmp_path / 'outbox'))
+    monkeypatch.setenv('OUTBOX_INITIAL_BACKOFF', '0.05')
+    monkeypatch.setenv('OUTBOX_MAX_BACKOFF', '0.2')
+    monkeypatch.setenv('OUTBOX_REQUEST_TIMEOUT', '1.0')
+    return free_port()
+
+def test_outage_then_recovery_delivers_everything(outbox_env):
+    server = StandInServer(outbox_env)
+    outbox = Outbox(f"http://127.0.0.1:{outbox_env}/car-crossing/batch")
+    outbox.start()
+    try:
+        keys = [outbox.put(b'jpeg', {"timestamp": i, "car_id": i}) for i in range(25)]
+
+        # Server is down: nothing may be lost while the sender backs off
+        time.sleep(0.5)
+        assert len(outbox.pending()) == 25
+
+        server.start()
+        assert wait_for(lambda: not outbox.pending())
+        assert server.saved == keys
+    finally:
+        outbox.stop(2)
+        if server.httpd:
+            server.stop()
+
+def test_replayed_key_is_dropped_as_duplicate(outbox_env):
+    server = StandInServer(outbox_env)
+    server.start()
+    outbox = Outbox(f"http://127.0.0.1:{outbox_env}/car-crossing/batch")
+    outbox.start()
+    try:
+        key = outbox.put(b'jpeg', {"timestamp": 1.0, "car_id": 1})
+        assert wait_for(lambda: not outbox.pending())
+
+        # Same key spooled again, e.g. after a crash before the local delete
+        outbox.put(b'jpeg', {"timestamp": 1.0, "car_id": 1, "idempotency_key": key})
+        assert wait_for(lambda: not outbox.pending())
+        assert server.saved == [key]
+    finally:
+        outbox.stop(2)
+        server.stop()
+
+def test_items_the_server_failed_to_save_stay_spooled(outbox_env):
+    server = StandInServer(outbox_env)
+    server.start()
+    outbox = Outbox(f"http://127.0.0.1:{outbox_env}/car-crossing/batch")
+    try:
+        good = outbox.put(b'jpeg', {"timestamp": 1.0, "car_id": 1})
+        bad = outbox.put(b'jpeg', {"timestamp": 2.0, "car_id": 2})
+        server.fail_keys.add(bad)
+
+        assert outbox.drain() is False
+        assert server.saved == [good]
+        assert len(outbox.pending()) == 1 and outbox.pending()[0].endswith(bad)
+
+        server.fail_keys.clear()
+        assert outbox.drain() is True
+        assert server.saved == [good, bad]
+    finally:
+        server.stop()
+
+def test_invalid_entry_does_not_block_the_spool(outbox_env, monkeypatch):
+    monkeypatch.setenv('OUTBOX_BATCH_SIZE', '1')
+    server = StandInServer(outbox_env)
+    server.start()
+    outbox = Outbox(f"http://127.0.0.1:{outbox_env}/car-crossing/batch")
+    try:
+        corrupt = outbox.put(b'not a jpeg', {"timestamp": 1.0, "car_id": 1})
+        good = outbox.put(b'jpeg', {"timestamp": 2.0, "car_id": 2})
+        server.invalid_keys.add(corrupt)
+
+        assert outbox.drain() is True
+        assert outbox.pending() == []
+        assert server.saved == [good]
+    finally:
+        server.stop()
+
+def test_crash_leftovers_are_removed_on_start(outbox_env, tmp_path):
+    outbox_dir = tmp_path / 'outbox'
+    outbox_dir.mkdir()
+    (outbox_dir / '00000000000000000001_aa.jpg').write_bytes(b'x' * 100)
+    (outbox_dir / '00000000000000000002_bb.jpg.tmp').write_bytes(b'x' * 100)
+    (outbox_dir / '00000000000000000003_cc.jpg').write_bytes(b'x' * 100)
+    (outbox_dir / '00000000000000000003_cc.json').write_bytes(b'{}')
+
+    outbox = Outbox(f"http://127.0.0.1:{outbox_env}/car-crossing/batch")
+
+    assert sorted(os.listdir(outbox_dir)) == ['00000000000000000003_cc.jpg', '00000000000000000003_cc.json']
+    assert outbox._total_bytes == 102
+
+def test_size_cap_drops_oldest_entries(outbox_env, monkeypatch):
+    monkeypatch.setenv('OUTBOX_MAX_BYTES', '1000')
+    outbox = Outbox(f"http://127.0.0.1:{outbox_env}/car-crossing/batch")
+
+    keys = [outbox.put(b'x' * 300, {"timestamp": i, "car_id": i}) for i in range(5)]
+
+    pending = outbox.pending()
+    assert [name.split('_')[1] for name in pending] == keys[-len(pending):]
+    assert outbox._total_bytes <= 1000
+    assert outbox._total_bytes == sum(
+        os.path.getsize(os.path.join(outbox.outbox_dir, f)) for f in os.listdir(outbox.outbox_dir)
+    )